@@ -10,6 +10,8 @@ from typing import Any
 from allauth.headless.adapter import DefaultHeadlessAdapter
 from django.contrib.auth.models import AbstractUser
 
+from .pictures import get_user_picture
+
 
 class CustomHeadlessAdapter(DefaultHeadlessAdapter):
     """
@@ -28,10 +30,7 @@ class CustomHeadlessAdapter(DefaultHeadlessAdapter):
 
         # Add profile picture from social account
         try:
-            from allauth.socialaccount.models import SocialAccount
-
-            social = SocialAccount.objects.filter(user=user).first()
-            data["picture"] = social.get_avatar_url() if social else None
+            data["picture"] = get_user_picture(user)
         except Exception:
             data["picture"] = None
 
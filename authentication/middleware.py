@@ -1,4 +1,7 @@
-from asgiref.sync import sync_to_async
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .pictures import picture_cache
+from .sessions import authenticate_headers
 
 
 class XSessionTokenMiddleware:
@@ -8,8 +11,15 @@ class XSessionTokenMiddleware:
     It checks for the 'x-session-token' header and, if present and the user
     is not already authenticated (e.g. via cookie), attempts to authenticate
     using django-allauth's headless session kit.
+
+    See `authentication.sessions` for the token resolution.
     """
 
+    __slots__ = ("inner",)
+
+    # Paths that never need a session user, passed through without a header scan
+    skip_path_prefixes = ("/static/", "/media/", "/api/health/", "/favicon.ico")
+
     def __init__(self, inner):
         self.inner = inner
 
@@ -18,36 +28,50 @@ class XSessionTokenMiddleware:
         if scope["type"] not in ("http", "websocket"):
             return await self.inner(scope, receive, send)
 
+        if scope.get("path", "").startswith(self.skip_path_prefixes):
+            return await self.inner(scope, receive, send)
+
         # Check if user is already authenticated by AuthMiddlewareStack via cookie
         # AuthMiddlewareStack ensures 'user' is in scope (even if AnonymousUser)
         user = scope.get("user")
         if user and user.is_authenticated:
             return await self.inner(scope, receive, send)
 
-        # Look for X-Session-Token header
-        # Headers are list of tuples [(b'name', b'value')], convert to dict for lookup
-        headers = dict(scope.get("headers", []))
-        # Header keys are lowercased by the ASGI server
-        session_token = headers.get(b"x-session-token", b"").decode("utf-8")
-
-        if session_token:
-            try:
-                # Lazy import to avoid App Registry access during ASGI initialization
-                from allauth.headless.internal.sessionkit import (
-                    authenticate_by_x_session_token,
-                )
-
-                # Authenticate using allauth's internal sessionkit
-                # sync_to_async is needed as it performs database operations
-                auth_result = await sync_to_async(authenticate_by_x_session_token)(
-                    session_token
-                )
-                if auth_result:
-                    user, _ = auth_result
-                    scope["user"] = user
-            except Exception:
-                # Silently fail on auth errors and let the request proceed as anonymous
-                # or let the consumer handle the lack of a user.
-                pass
+        # Failed authentications let the request proceed as anonymous
+        # and the consumer handle the lack of a user.
+        user = await authenticate_headers(scope.get("headers", ()))
+        if user is not None:
+            scope["user"] = user
 
         return await self.inner(scope, receive, send)
+
+
+class PictureCacheMiddleware:
+    """
+    Django middleware that scopes the profile picture cache
+    (see `authentication.pictures`) to a single request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = picture_cache.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            picture_cache.reset(token)
+
+    async def __acall__(self, request):
+        token = picture_cache.set({})
+        try:
+            return await self.get_response(request)
+        finally:
+            picture_cache.reset(token)
@@ -0,0 +1,35 @@
+"""
+Profile picture lookup shared by the headless adapter and the user serializer.
+
+Both may serialize the same user within one request, so resolved pictures are
+memoized in a request-scoped context variable (see PictureCacheMiddleware).
+"""
+
+from contextvars import ContextVar
+from typing import Any
+
+# {user_pk: picture_url} for the current request, None outside of a request
+picture_cache: ContextVar[dict[Any, str | None] | None] = ContextVar(
+    "picture_cache", default=None
+)
+
+
+def get_user_picture(user: Any) -> str | None:
+    """Returns the avatar URL of the user's social account (if available)."""
+    cache = picture_cache.get()
+    if cache is not None and user.pk in cache:
+        return cache[user.pk]
+
+    # Lazy import to avoid App Registry access during ASGI initialization
+    from allauth.socialaccount.models import SocialAccount
+
+    # We are assuming one social account per user for simplicity
+    # This must change if more OAuth providers added in the future
+    social = (
+        SocialAccount.objects.filter(user=user).only("extra_data", "provider").first()
+    )
+    picture = (social.get_avatar_url() or None) if social else None
+
+    if cache is not None:
+        cache[user.pk] = picture
+    return picture
@@ -1,8 +1,15 @@
-from allauth.socialaccount.models import SocialAccount
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import User as DjangoUser
 from rest_framework import serializers
 
+from .pictures import get_user_picture
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User as DjangoUser
+
 User = get_user_model()
 
 
@@ -29,10 +36,6 @@ class CustomUserDetailsSerializer(serializers.ModelSerializer):
         """
         Returns the profile picture URL from the user's social account (if available).
         """
-        try:
-            # We are assuming one social account per user for simplicity
-            # This must change if more OAuth providers added in the future
-            social_account = SocialAccount.objects.get(user=user)
-            return social_account.get_avatar_url() or None
-        except SocialAccount.DoesNotExist:
-            return None
+        # Shared with the headless adapter, so a request serializing the same
+        # user through both only queries once
+        return get_user_picture(user)
@@ -0,0 +1,105 @@
+"""
+Shared X-Session-Token authentication helpers.
+
+Resolves headless session tokens (django-allauth) to users for ASGI entry
+points. Every request checks its session against the session store, so a
+revoked session stops authenticating immediately.
+"""
+
+import asyncio
+import copy
+import hashlib
+import re
+from functools import partial
+from typing import Any, Iterable
+
+from asgiref.sync import sync_to_async
+
+SESSION_TOKEN_HEADER = b"x-session-token"
+
+# Loose shape of a session token (Django session keys are 32 lowercase
+# alphanumerics). Anything else can't authenticate, so it's rejected before
+# the thread-pool hop and the session lookup.
+SESSION_TOKEN_PATTERN = re.compile(rb"[A-Za-z0-9._-]{20,256}")
+
+# Lookups currently awaiting the database, keyed by a digest of the token (the
+# raw token is never stored)
+_inflight_authentications: dict[bytes, "asyncio.Task[Any | None]"] = {}
+
+
+def _hash_session_token(session_token: str) -> bytes:
+    return hashlib.blake2b(session_token.encode("utf-8"), digest_size=16).digest()
+
+
+def get_session_token(headers: Iterable[tuple[bytes, bytes]]) -> str:
+    """
+    Returns the X-Session-Token value from raw ASGI headers, or an empty string
+    if it's missing or malformed.
+
+    Header keys are lowercased by the ASGI server, so the first exact match wins.
+    """
+    token = next((v for k, v in headers if k == SESSION_TOKEN_HEADER), b"")
+    if not SESSION_TOKEN_PATTERN.fullmatch(token):
+        return ""
+    return token.decode("ascii")
+
+
+async def authenticate_session_token(session_token: str) -> Any | None:
+    """
+    Returns the user authenticated by the given session token, or None.
+
+    Errors are swallowed so callers can treat the request as anonymous.
+    """
+    if not session_token:
+        return None
+
+    token_hash = _hash_session_token(session_token)
+
+    # Concurrent requests with the same token (e.g. a burst of SSE reconnects)
+    # wait for the lookup already in flight instead of starting their own.
+    # The lookup runs in its own task, and shield() keeps any cancelled
+    # caller, including the one that started it, from cancelling it for
+    # the others.
+    lookup = _inflight_authentications.get(token_hash)
+    if lookup is None:
+        lookup = asyncio.create_task(_authenticate_by_x_session_token(session_token))
+        _inflight_authentications[token_hash] = lookup
+        lookup.add_done_callback(partial(_forget_inflight_authentication, token_hash))
+
+    # Each caller gets its own copy, so requests never share a user instance
+    return copy.deepcopy(await asyncio.shield(lookup))
+
+
+def _forget_inflight_authentication(
+    token_hash: bytes, lookup: "asyncio.Task[Any | None]"
+) -> None:
+    if _inflight_authentications.get(token_hash) is lookup:
+        del _inflight_authentications[token_hash]
+
+
+async def _authenticate_by_x_session_token(session_token: str) -> Any | None:
+    """Authenticates the session token against the database, or returns None."""
+    try:
+        # Lazy import to avoid App Registry access during ASGI initialization
+        from allauth.headless.internal.sessionkit import (
+            authenticate_by_x_session_token,
+        )
+
+        # Authenticate using allauth's internal sessionkit
+        # sync_to_async is needed as it performs database operations
+        auth_result = await sync_to_async(authenticate_by_x_session_token)(
+            session_token
+        )
+    except Exception:
+        return None
+
+    if not auth_result:
+        return None
+
+    user, _ = auth_result
+    return user
+
+
+async def authenticate_headers(headers: Iterable[tuple[bytes, bytes]]) -> Any | None:
+    """Returns the user authenticated by the X-Session-Token header, or None."""
+    return await authenticate_session_token(get_session_token(headers))
@@ -1 +1,44 @@
-# Create your tests here.
+import asyncio
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+
+from authentication import sessions
+
+SESSION_TOKEN = "a" * 32
+
+
+class AuthenticateSessionTokenTests(SimpleTestCase):
+    async def test_cancelled_first_caller_does_not_fail_concurrent_callers(self):
+        lookup_started = asyncio.Event()
+        release_lookup = asyncio.Event()
+
+        async def slow_lookup(session_token: str) -> User:
+            lookup_started.set()
+            await release_lookup.wait()
+            return User(pk=1, username="owner")
+
+        with mock.patch.object(
+            sessions, "_authenticate_by_x_session_token", side_effect=slow_lookup
+        ) as lookup:
+            first = asyncio.create_task(
+                sessions.authenticate_session_token(SESSION_TOKEN)
+            )
+            await lookup_started.wait()
+            second = asyncio.create_task(
+                sessions.authenticate_session_token(SESSION_TOKEN)
+            )
+            await asyncio.sleep(0)
+
+            first.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+
+            release_lookup.set()
+            user = await second
+
+        self.assertIsNotNone(user)
+        self.assertEqual(user.username, "owner")
+        lookup.assert_called_once()
+        self.assertEqual(sessions._inflight_authentications, {})
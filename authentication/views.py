@@ -5,7 +5,7 @@ This module provides CSRF token endpoint for headless web clients,
 as Django templates are not used in this API-only architecture.
 """
 
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.middleware.csrf import get_token
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -39,4 +39,9 @@ class CsrfTokenView(View):
         and sent back as X-CSRFToken header on mutating requests.
         """
         csrf_token = get_token(request)
-        return JsonResponse({"csrfToken": csrf_token})
+        # CSRF tokens only contain ASCII letters and digits (CSRF_ALLOWED_CHARS),
+        # so the body is formatted directly instead of going through json.dumps.
+        return HttpResponse(
+            b'{"csrfToken": "%s"}' % csrf_token.encode("ascii"),
+            content_type="application/json",
+        )
@@ -1,5 +1,12 @@
+import atexit
+import logging
+from logging.handlers import QueueListener
+
 from django.apps import AppConfig
 
+# Listener started by CoreConfig, so it is never started twice
+_started_logging_listener: QueueListener | None = None
+
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
@@ -7,3 +14,21 @@ class CoreConfig(AppConfig):
 
     def ready(self) -> None:
         import core.receivers  # noqa: F401, F811
+
+        self._start_logging_queue_listener()
+
+    @staticmethod
+    def _start_logging_queue_listener() -> None:
+        """
+        Starts the listener thread of the "queue" logging handler (see LOGGING),
+        which writes the queued records to the console and file handlers.
+        """
+        global _started_logging_listener
+
+        queue_handler = logging.getHandlerByName("queue")
+        listener = getattr(queue_handler, "listener", None)
+        if listener is None or listener is _started_logging_listener:
+            return
+        listener.start()
+        atexit.register(listener.stop)
+        _started_logging_listener = listener
@@ -1,10 +1,13 @@
+import uuid
 from typing import Any, Tuple
 
+from django.core.cache import cache
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.request import Request
 
 from .models import Agent
+from .utils import AGENT_CACHE_TTL, get_agent_cache_key
 
 
 class AgentAuthentication(BaseAuthentication):
@@ -15,6 +18,9 @@ class AgentAuthentication(BaseAuthentication):
     HTTP header, prepended with the string "Agent ". For example:
 
         Authorization: Agent 401f7ac8-b421-446e-a924-ebb915e61236
+
+    Successful lookups are cached for AGENT_CACHE_TTL seconds, and
+    invalidated whenever the agent is saved or deleted (see core.receivers).
     """
 
     def authenticate(self, request: Request) -> Tuple[Any, Agent] | None:
@@ -24,9 +30,19 @@ class AgentAuthentication(BaseAuthentication):
             return None
 
         try:
-            agent_key = auth_header.split(" ")[1]
-            agent = Agent.objects.select_related("owner").get(key=agent_key)
-        except (IndexError, Agent.DoesNotExist):
+            # Normalize the key so it always maps to the same cache entry
+            agent_key = uuid.UUID(auth_header.split(" ")[1])
+        except (IndexError, ValueError):
             raise AuthenticationFailed("Invalid agent key.")
 
+        cache_key = get_agent_cache_key(agent_key)
+        agent = cache.get(cache_key)
+        if agent is None:
+            try:
+                agent = Agent.objects.select_related("owner").get(key=agent_key)
+            except Agent.DoesNotExist:
+                # Failed lookups are not cached, so probing can't flood the cache
+                raise AuthenticationFailed("Invalid agent key.")
+            cache.set(cache_key, agent, AGENT_CACHE_TTL)
+
         return (agent.owner, agent)
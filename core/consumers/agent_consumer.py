@@ -1,24 +1,74 @@
 import asyncio
-import json
 import logging
+import re
 import uuid
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.core.cache import cache
 from django.db.utils import DatabaseError
 from django.utils import timezone
+from pydantic import ValidationError
 
 from core.consumers.events import (
     agent_event_type_adapter,
+    broadcast_agent,
     get_agent,
     handle_agent_event,
     update_agent_ip,
+    update_service_statuses,
+)
+from core.consumers.events.typing import (
+    AgentServiceStatusUpdateEvent,
+    AgentServiceStatusUpdatePayload,
+    ServiceStatus,
 )
 from core.models import Agent
-from core.utils import get_client_ip
+from core.utils import get_agent_cache_key, get_client_ip
 
 logger = logging.getLogger(__name__)
 
+# Canonical (hyphenated) agent key, checked before parsing it as a UUID
+AGENT_KEY_PATTERN = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+
+# Channel-layer message type handled by AgentConsumer.supersede_connection
+SUPERSEDE_CONNECTION_TYPE = "supersede.connection"
+
+# Seconds after a service's status is written during which repeats of the
+# same status are collected, so a burst of them ends up as a single write and
+# broadcast. The first update and every status change are written at once.
+STATUS_UPDATE_FLUSH_DELAY = 0.2
+
+# Grace period tasks of disconnected agents by agent ID. A reconnect cancels
+# its agent's task, and a new disconnect replaces it, so they never stack.
+_pending_disconnects: dict[int, asyncio.Task] = {}
+
+
+async def _deferred_mark_disconnected(agent_id: int, grace_period: int) -> None:
+    """
+    Marks the agent as disconnected if it is still offline after the grace
+    period. Works on the agent ID only, holding no reference to the consumer.
+    """
+    try:
+        await asyncio.sleep(grace_period)
+        agent = await database_sync_to_async(Agent.objects.filter(pk=agent_id).first)()
+        if agent and agent.last_seen is not None:
+            # Agent is still offline after grace period - mark as disconnected
+            await database_sync_to_async(agent.mark_disconnected)()
+    except DatabaseError:
+        logger.error("Database error during grace period disconnect", exc_info=True)
+    finally:
+        if _pending_disconnects.get(agent_id) is asyncio.current_task():
+            del _pending_disconnects[agent_id]
+
+
+def _cancel_pending_disconnect(agent_id: int) -> None:
+    task = _pending_disconnects.pop(agent_id, None)
+    if task:
+        task.cancel()
+
 
 class AgentConsumer(AsyncWebsocketConsumer):
     """
@@ -26,17 +76,29 @@ class AgentConsumer(AsyncWebsocketConsumer):
     """
 
     agent: Agent | None = None
+    agent_group_name: str | None = None
+    superseded: bool = False
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Latest pending status update per service ID
+        self._pending_status_updates: dict[str, AgentServiceStatusUpdatePayload] = {}
+        # Status last written or queued per service ID, for the services
+        # written within the current STATUS_UPDATE_FLUSH_DELAY window
+        self._status_window: dict[str, ServiceStatus] = {}
+        self._status_flush_task: asyncio.Task | None = None
+        self._status_flush_lock = asyncio.Lock()
 
     async def connect(self) -> None:
         # Get the agent key from the URL
         agent_key = self.scope.get("url_route", {}).get("kwargs", {}).get("agent_key")
 
-        # Validate the agent key is a valid UUID
-        try:
-            agent_key = uuid.UUID(agent_key)
-        except ValueError:
+        # Validate the agent key is a valid UUID. Malformed keys are rejected
+        # by the pattern, without going through uuid.UUID's exception path.
+        if not agent_key or not AGENT_KEY_PATTERN.fullmatch(agent_key):
             await self.close(code=4001, reason="Invalid agent key")
             return
+        agent_key = uuid.UUID(agent_key)
 
         # Get the agent from the database
         self.agent = await get_agent(agent_key)
@@ -49,22 +111,26 @@ class AgentConsumer(AsyncWebsocketConsumer):
             )
             return
 
+        # The agent is back within its grace period
+        _cancel_pending_disconnect(self.agent.pk)
+
         # Ensure only one connection per agent is active at a time
-        self.superseded = False
         self.agent_group_name = f"agent_{self.agent.pk}"
 
-        # Broadcast to the group that a new connection is established
-        await self.channel_layer.group_send(
-            self.agent_group_name,
-            {
-                "type": "supersede.connection",
-                "new_channel_name": self.channel_name,
-            },
+        # Broadcast to the group that a new connection is established, and join
+        # the group to receive future supersede events. Both run concurrently:
+        # supersede_connection ignores the message sent for its own channel.
+        await asyncio.gather(
+            self.channel_layer.group_send(
+                self.agent_group_name,
+                {
+                    "type": SUPERSEDE_CONNECTION_TYPE,
+                    "new_channel_name": self.channel_name,
+                },
+            ),
+            self.channel_layer.group_add(self.agent_group_name, self.channel_name),
         )
 
-        # Join the group to receive future supersede events
-        await self.channel_layer.group_add(self.agent_group_name, self.channel_name)
-
         # Accept the connection (We are now receiving messages from the agent)
         await self.accept()
 
@@ -76,19 +142,92 @@ class AgentConsumer(AsyncWebsocketConsumer):
         text_data: str | None = None,
         bytes_data: bytes | None = None,
     ) -> None:
-        if not text_data or not self.agent:
+        # Binary frames carry the same UTF-8 JSON and are parsed as-is,
+        # skipping the decode to str
+        frame = text_data or bytes_data
+        if not frame or not self.agent:
             return
 
         try:
-            # Parsing and validate incoming event payload dynamically
-            event = agent_event_type_adapter.validate_json(text_data)
+            # Parse and validate the incoming event payload in a single pass
+            # with pydantic's native JSON parser (no intermediate dict)
+            event = agent_event_type_adapter.validate_json(frame)
 
-            await handle_agent_event(self.agent, event)
-        except json.JSONDecodeError:
-            logger.warning(f"Invalid JSON from agent {self.agent.pk}")
+            if type(event) is AgentServiceStatusUpdateEvent:
+                await self._queue_status_update(event.data)
+            else:
+                # Pending status updates are written first to keep event order
+                await self._flush_status_updates()
+                await handle_agent_event(self.agent, event)
+        except ValidationError:
+            # Raised for both malformed JSON and unknown/invalid event shapes
+            logger.warning("Invalid event from agent %s", self.agent.pk)
         except Exception as e:
             logger.error(f"Error in AgentConsumer.receive: {e}", exc_info=True)
 
+    async def _queue_status_update(self, data: AgentServiceStatusUpdatePayload) -> None:
+        """
+        Writes a status update, or buffers it when it repeats the status
+        written for the same service within the current window.
+
+        Only updates with the same status are coalesced, replacing the
+        pending one. Every transition (e.g. OK -> FAILURE -> OK) is written
+        at once, after any pending update of the service, so each one is
+        stored, broadcast and notified.
+        """
+        service_id = data.service_id
+        if self._status_window.get(service_id) == data.status:
+            self._pending_status_updates[service_id] = data
+            return
+
+        if service_id in self._pending_status_updates:
+            await self._flush_status_updates()
+        self._pending_status_updates[service_id] = data
+        self._status_window[service_id] = data.status
+        if self._status_flush_task is None:
+            self._status_flush_task = asyncio.create_task(
+                self._flush_status_updates_later()
+            )
+        await self._flush_status_updates()
+
+    async def _flush_status_updates_later(self) -> None:
+        """
+        Writes the updates collected during the window. The services written
+        now start a new window, the others are written at once next time.
+        """
+        await asyncio.sleep(STATUS_UPDATE_FLUSH_DELAY)
+        self._status_flush_task = None
+        self._status_window = {
+            service_id: update.status
+            for service_id, update in self._pending_status_updates.items()
+        }
+        try:
+            await self._flush_status_updates()
+        except Exception as e:
+            # The updates stay pending and are written with the next flush
+            self._status_window.clear()
+            logger.error(f"Error flushing status updates: {e}", exc_info=True)
+            return
+        if self._status_window and self._status_flush_task is None:
+            self._status_flush_task = asyncio.create_task(
+                self._flush_status_updates_later()
+            )
+
+    async def _flush_status_updates(self) -> None:
+        """
+        Writes all pending status updates. They are dropped from the buffer
+        only once written, so a failed write leaves them pending.
+        """
+        async with self._status_flush_lock:
+            if not self._pending_status_updates or not self.agent:
+                return
+            updates = list(self._pending_status_updates.values())
+            await update_service_statuses(self.agent, updates)
+            for update in updates:
+                # Unless a newer update of the service arrived meanwhile
+                if self._pending_status_updates.get(update.service_id) is update:
+                    del self._pending_status_updates[update.service_id]
+
     async def supersede_connection(self, event: dict) -> None:
         """
         Received when a redundant client connects for the SAME agent.
@@ -105,50 +244,68 @@ class AgentConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, code: int) -> None:
         """Handle agent disconnection with grace period support."""
+        # Write the status updates still waiting in the buffer
+        if self._status_flush_task:
+            self._status_flush_task.cancel()
+            self._status_flush_task = None
+        try:
+            await self._flush_status_updates()
+        except DatabaseError:
+            logger.error("Database error while flushing status updates", exc_info=True)
+
         # Unsubscribe from group
-        if getattr(self, "agent_group_name", None):
+        if self.agent_group_name:
             await self.channel_layer.group_discard(
                 self.agent_group_name, self.channel_name
             )
 
         # Do not modify the database if we were kicked by a newer connection
-        if getattr(self, "superseded", False):
+        if self.superseded:
             logger.debug(
-                f"Ignoring disconnect for superseded channel {self.channel_name}"
+                "Ignoring disconnect for superseded channel %s", self.channel_name
             )
             return
 
         try:
             if self.agent:
-                # Refresh from DB before checking last_seen
+                # Refresh from DB, the agent (e.g. its grace period or name)
+                # may have been edited while connected
                 await database_sync_to_async(self.agent.refresh_from_db)()
 
                 if self.agent.last_seen is None:  # is currently connected
-                    self.agent.last_seen = timezone.now()  # mark disconnection time
-                    await database_sync_to_async(self.agent.save)(
-                        update_fields=["last_seen"]
-                    )
+                    await self._mark_disconnection_time(self.agent)
 
                 # If grace period is 0, mark disconnected immediately
                 if self.agent.grace_period == 0:
                     await database_sync_to_async(self.agent.mark_disconnected)()
                     return
 
-                # Fire-and-forget
-                asyncio.create_task(self._grace_period_disconnect(self.agent))
+                # Runs independently of this consumer, avoiding blocking of
+                # the main ASGI handler
+                agent_id = self.agent.pk
+                _cancel_pending_disconnect(agent_id)
+                _pending_disconnects[agent_id] = asyncio.create_task(
+                    _deferred_mark_disconnected(agent_id, self.agent.grace_period)
+                )
         except DatabaseError:
             logger.error("Database error while disconnecting agent", exc_info=True)
 
-    async def _grace_period_disconnect(self, agent: Agent) -> None:
+    async def _mark_disconnection_time(self, agent: Agent) -> None:
         """
-        Background task to check if agent reconnected within grace period.
-        Runs independently, avoiding blocking of the main ASGI handler.
+        Sets agent.last_seen to now, if the agent is still marked as connected.
+
+        A conditional UPDATE rather than save(), so a reconnect racing this
+        disconnect can't have its cleared last_seen overwritten.
         """
-        try:
-            await asyncio.sleep(agent.grace_period)
-            await database_sync_to_async(agent.refresh_from_db)()
-            if agent.last_seen is not None:
-                # Agent is still offline after grace period - mark as disconnected
-                await database_sync_to_async(agent.mark_disconnected)()
-        except DatabaseError:
-            logger.error("Database error during grace period disconnect", exc_info=True)
+        now = timezone.now()
+        updated = await database_sync_to_async(
+            Agent.objects.filter(pk=agent.pk, last_seen__isnull=True).update
+        )(last_seen=now)
+        if not updated:
+            return
+
+        agent.last_seen = now
+        # A queryset update sends no post_save, so do what its receivers would:
+        # drop the cached agent and send clients the new last_seen
+        cache.delete(get_agent_cache_key(agent.key))
+        await broadcast_agent(agent)
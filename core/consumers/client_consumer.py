@@ -1,12 +1,14 @@
 import asyncio
+import itertools
 import logging
 import uuid
 
 from channels.generic.http import AsyncHttpConsumer
 from django.conf import settings
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 
 from core.consumers.events import client_event_type_adapter, get_user_agents
+from core.consumers.events.broadcasting import SSE_EVENT_FRAME
 from core.consumers.events.typing import (
     ClientInitialStatusEvent,
     ClientInitialStatusPayload,
@@ -15,114 +17,349 @@ from core.consumers.groups import get_client_group_name, get_user_sse_channel_na
 
 logger = logging.getLogger(__name__)
 
+# Static 401 response, shared by every unauthenticated request
+UNAUTHORIZED_BODY = b'{"detail": "Authentication required"}'
+UNAUTHORIZED_HEADERS = ((b"Content-Type", b"application/json"),)
+
+# Headers of every SSE response, followed by the CORS headers when the
+# origin is allowed
+SSE_HEADERS = (
+    (b"Content-Type", b"text/event-stream"),
+    (b"Cache-Control", b"no-cache"),
+    (b"Transfer-Encoding", b"chunked"),
+    (b"Connection", b"keep-alive"),
+)
+CORS_CREDENTIALS_HEADER = (b"Access-Control-Allow-Credentials", b"true")
+
+# Allowed origins as raw header values, so the request origin is checked
+# with a single set lookup, without decoding it
+ALLOWED_ORIGINS = frozenset(origin.encode() for origin in settings.CORS_ALLOWED_ORIGINS)
+
+# Seconds without events before a heartbeat comment is sent
+HEARTBEAT_INTERVAL = 30
+# Upper bounds of frames and bytes written with a single send_body when
+# coalescing, so a long burst still reaches the client in steady chunks
+MAX_FRAMES_PER_WRITE = 100
+MAX_BYTES_PER_WRITE = 64 * 1024
+# Messages queued for an SSE connection before newer ones are dropped, the
+# same as the capacity of the channel layer channel feeding it
+_CHANNEL_LAYER_CONFIG = settings.CHANNEL_LAYERS["default"].get("CONFIG", {})
+MAX_PENDING_MESSAGES = _CHANNEL_LAYER_CONFIG.get("capacity", 100)
+# Seconds between re-joins of a user's group. The channel layer drops group
+# members older than its group_expiry, so a stream outliving it would stop
+# receiving broadcasts.
+GROUP_REFRESH_INTERVAL = _CHANNEL_LAYER_CONFIG.get("group_expiry", 86400) / 2
+
+
+class _UserStream:
+    """
+    Channel layer subscription shared by all SSE connections of a user in
+    this process.
+
+    The user's group gets a single member per process, so a broadcast goes
+    through Redis once per process instead of once per connection. A reader
+    task hands every message to the queue of each connection.
+    """
+
+    def __init__(self, channel_layer, user_id: int) -> None:
+        self.channel_layer = channel_layer
+        self.group_name = get_client_group_name(user_id)
+        # Hybrid naming: deterministic prefix + unique suffix per stream, so
+        # channels stay debuggable and a new stream never reuses a channel
+        # that an old one is still leaving
+        base_channel = get_user_sse_channel_name(user_id)
+        self.channel_name = f"{base_channel}_{uuid.uuid4().hex[:8]}"
+        self.queues: set[asyncio.Queue] = set()
+        self._join: asyncio.Future | None = None
+        self._reader: asyncio.Task | None = None
+        self._refresher: asyncio.Task | None = None
+
+    async def join(self) -> None:
+        """Joins the user's group, once for all connections."""
+        if self._join is None:
+            self._join = asyncio.ensure_future(
+                self.channel_layer.group_add(self.group_name, self.channel_name)
+            )
+        # Shielded, a connection going away must not cancel the join of others
+        await asyncio.shield(self._join)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+            self._refresher = asyncio.create_task(self._refresh())
+
+    async def leave(self) -> None:
+        """Stops reading and leaves the user's group."""
+        if self._reader:
+            self._reader.cancel()
+        if self._refresher:
+            self._refresher.cancel()
+        if self._join:
+            # A join still in flight would otherwise land after the discard
+            await asyncio.wait({self._join})
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def _refresh(self) -> None:
+        """Re-joins the user's group before the membership expires."""
+        while True:
+            await asyncio.sleep(GROUP_REFRESH_INTERVAL)
+            try:
+                await self.channel_layer.group_add(self.group_name, self.channel_name)
+            except Exception as e:
+                logger.error("SSE [%s] Group refresh error: %s", self.channel_name, e)
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self.channel_layer.receive(self.channel_name)
+            except Exception as e:
+                logger.error("SSE [%s] Receive error: %s", self.channel_name, e)
+                await asyncio.sleep(1)
+                continue
+
+            for queue in self.queues:
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    logger.warning(
+                        "SSE [%s] Client is too slow, dropping a message",
+                        self.channel_name,
+                    )
+
+
+# Numbers the SSE connections of this process, to tell them apart in logs
+_connection_ids = itertools.count(1)
+
+# Shared streams of the users with open SSE connections in this process
+_user_streams: dict[int, _UserStream] = {}
+
+
+def has_local_subscribers(user_id: int) -> bool:
+    """Returns whether the user has an open SSE connection in this process."""
+    return user_id in _user_streams
+
+
+async def _open_user_stream(channel_layer, user_id: int) -> asyncio.Queue:
+    """
+    Returns a new queue of the user's channel layer messages. The first
+    connection of the user in this process joins the user's group.
+    """
+    stream = _user_streams.get(user_id)
+    if stream is None:
+        stream = _user_streams[user_id] = _UserStream(channel_layer, user_id)
+    queue = asyncio.Queue(MAX_PENDING_MESSAGES)
+    stream.queues.add(queue)
+    try:
+        await stream.join()
+    except BaseException:
+        await _close_user_stream(user_id, queue)
+        raise
+    return queue
+
+
+async def _close_user_stream(user_id: int, queue: asyncio.Queue) -> None:
+    """
+    Stops feeding the queue. The last connection of the user in this
+    process leaves the user's group.
+    """
+    stream = _user_streams.get(user_id)
+    if stream is None or queue not in stream.queues:
+        return
+    stream.queues.discard(queue)
+    if stream.queues:
+        return
+    del _user_streams[user_id]
+    await stream.leave()
+
 
 class ClientConsumer(AsyncHttpConsumer):
     """Server-Sent Events consumer for streaming agent updates to clients."""
 
-    user_clients_group_name = None
+    user_id = None
     _disconnecting = False
+    # Channel layer messages of this connection, fed by the user's stream
+    _messages: asyncio.Queue | None = None
+    # Pending message receive, kept across heartbeats and write windows
+    _receive_task: asyncio.Future | None = None
+    # Frames collected while coalescing writes, None when writing directly
+    _write_buffer: list[bytes] | None = None
+    _write_buffer_size = 0
+    _heartbeat_task: asyncio.Task | None = None
+    # Event loop time of the last write to the stream
+    _last_write_at = 0.0
 
     async def handle(self, body):
         user = self.scope["user"]
 
         if not user.is_authenticated:
             await self.send_response(
-                401,
-                b"Authentication required",
-                headers=[(b"Content-Type", b"application/json")],
+                401, UNAUTHORIZED_BODY, headers=UNAUTHORIZED_HEADERS
             )
             return
 
         # CORS headers
-        cors_headers = []
-        for key, value in self.scope["headers"]:
-            if key == b"origin" and value.decode() in settings.CORS_ALLOWED_ORIGINS:
-                # Add the validated origin header and credentials header to the response
-                cors_headers.append((b"Access-Control-Allow-Origin", value))
-                cors_headers.append((b"Access-Control-Allow-Credentials", b"true"))
-                break
+        origin = dict(self.scope["headers"]).get(b"origin")
+        if origin in ALLOWED_ORIGINS:
+            # Add the validated origin header and credentials header to the response
+            headers = (
+                *SSE_HEADERS,
+                (b"Access-Control-Allow-Origin", origin),
+                CORS_CREDENTIALS_HEADER,
+            )
+        else:
+            headers = SSE_HEADERS
 
         # Send SSE headers
-        await self.send_headers(
-            headers=[
-                (b"Content-Type", b"text/event-stream"),
-                (b"Cache-Control", b"no-cache"),
-                (b"Transfer-Encoding", b"chunked"),
-                (b"Connection", b"keep-alive"),
-                *cors_headers,
-            ]
-        )
+        await self.send_headers(headers=headers)
 
-        # Setup channel and group
-        # Use hybrid naming: deterministic prefix + unique suffix per connection
-        # This ensures all clients receive messages while keeping channels debuggable
-        self.user_clients_group_name = get_client_group_name(user.pk)
+        # Name the connection after the user, to keep the logs debuggable.
+        # It is not a channel layer channel, so it only has to be unique
+        # within the process.
+        self.user_id = user.pk
         base_channel = get_user_sse_channel_name(user.pk)
-        self.channel_name = f"{base_channel}_{uuid.uuid4().hex[:8]}"
+        self.channel_name = f"{base_channel}_{next(_connection_ids):x}"
 
-        logger.debug(f"SSE [{self.channel_name}] Connected")
+        logger.debug("SSE [%s] Connected", self.channel_name)
 
+        # Subscribe to the user's group through the stream shared by all of
+        # the user's connections in this process
         try:
-            await self.channel_layer.group_add(
-                self.user_clients_group_name, self.channel_name
-            )
+            self._messages = await _open_user_stream(self.channel_layer, user.pk)
         except Exception as e:
             logger.error(f"SSE [{self.channel_name}] Failed to join group: {e}")
             return
 
         # Send initial status
         initial_agents = await get_user_agents(user)
-        event = ClientInitialStatusEvent(
-            data=ClientInitialStatusPayload(agents=initial_agents)
+        # The agents are client models mapped from ORM rows, so the event
+        # around them is built without another validation pass
+        event = ClientInitialStatusEvent.model_construct(
+            data=ClientInitialStatusPayload.model_construct(agents=initial_agents)
         )
         await self._send_event(event)
 
-        # Listen for events
+        # Keep the connection alive while no events are flowing
+        self._heartbeat_task = asyncio.create_task(self._send_heartbeats())
+
+        # Listen for events. The bound methods are looked up once, not on
+        # every iteration of this long-lived loop.
+        write_delay = settings.SSE_WRITE_DELAY_MS / 1000
+        receive_message = self._receive_message
+        handle_message = self._handle_message
         try:
             while not self._disconnecting:
-                try:
-                    # Wait for a channel layer message with a timeout for heartbeats
-                    message = await asyncio.wait_for(
-                        self.channel_layer.receive(self.channel_name),
-                        timeout=30,
-                    )
-                    await self._handle_message(message)
+                # Heartbeats run in their own task, so messages are awaited
+                # without a timeout (no timer per message)
+                message = await receive_message()
+                if message is None:
+                    continue
 
-                except asyncio.TimeoutError:
-                    if not self._disconnecting:
-                        # Send heartbeat comment to keep connection alive
-                        await self.send_body(b":heartbeat\n\n", more_body=True)
+                if write_delay:
+                    await self._handle_message_burst(message, write_delay)
+                else:
+                    await handle_message(message)
 
         except asyncio.CancelledError:
-            logger.debug(f"SSE [{self.channel_name}] Disconnected")
+            logger.debug("SSE [%s] Disconnected", self.channel_name)
             self._disconnecting = True
             raise
         finally:
+            if self._heartbeat_task:
+                self._heartbeat_task.cancel()
+            if self._receive_task:
+                self._receive_task.cancel()
             await self._cleanup()
 
+    async def _send_heartbeats(self) -> None:
+        """
+        Sends a heartbeat comment whenever nothing was written to the stream
+        for HEARTBEAT_INTERVAL seconds.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._disconnecting:
+                idle = loop.time() - self._last_write_at
+                if idle < HEARTBEAT_INTERVAL:
+                    await asyncio.sleep(HEARTBEAT_INTERVAL - idle)
+                    continue
+                await self._write(b":heartbeat\n\n")
+        except Exception as e:
+            # The stream is gone; stop waiting for messages so handle() exits
+            logger.debug("SSE [%s] Heartbeat failed: %s", self.channel_name, e)
+            self._disconnecting = True
+            if self._receive_task:
+                self._receive_task.cancel()
+
+    async def _receive_message(self, timeout: float | None = None) -> dict | None:
+        """
+        Waits up to `timeout` seconds (indefinitely if None) for the next
+        channel layer message.
+
+        Unlike asyncio.wait_for, a timeout leaves the receive pending for the
+        next call instead of cancelling it.
+        """
+        if self._receive_task is None:
+            self._receive_task = asyncio.ensure_future(self._messages.get())
+        done, _ = await asyncio.wait({self._receive_task}, timeout=timeout)
+        if not done:
+            return None
+        task, self._receive_task = self._receive_task, None
+        if task.cancelled():
+            return None
+        return task.result()
+
+    async def _handle_message_burst(self, message: dict, write_delay: float) -> None:
+        """
+        Handles the message along with any that follow within `write_delay`
+        seconds of each other, and writes all their frames in one send_body.
+        """
+        self._write_buffer = []
+        self._write_buffer_size = 0
+        try:
+            await self._handle_message(message)
+            while (
+                len(self._write_buffer) < MAX_FRAMES_PER_WRITE
+                and self._write_buffer_size < MAX_BYTES_PER_WRITE
+            ):
+                next_message = await self._receive_message(timeout=write_delay)
+                if next_message is None:
+                    break
+                await self._handle_message(next_message)
+        finally:
+            frames, self._write_buffer = self._write_buffer, None
+        if not frames or self._disconnecting:
+            return
+        try:
+            await self._write(b"".join(frames))
+        except Exception as e:
+            logger.error("SSE [%s] Send error: %s", self.channel_name, e)
+
     async def _handle_message(self, message: dict) -> None:
         """Dispatch message to appropriate handler based on type."""
-        handler_name = message["type"].replace(".", "_")
-        handler = getattr(self, handler_name, None)
+        handler = self.message_handlers.get(message["type"])
 
         if handler:
-            await handler(message)
+            await handler(self, message)
         else:
             logger.warning(
-                f"SSE [{self.channel_name}] Unknown message type: {handler_name}"
+                "SSE [%s] Unknown message type: %s", self.channel_name, message["type"]
             )
 
     async def _handle_event(self, message: dict) -> None:
-        """Generic handler for all event types."""
-        if self._disconnecting:
-            return
-        await self._send_event(message["event"])
+        """
+        Generic handler for all event types.
+
+        Broadcast events are rendered to SSE frames once by the producer,
+        so the frame is streamed as-is.
+        """
+        await self._send_frame(message["sse_frame"])
 
-    # Message handlers - all delegate to _handle_event
-    status_update = _handle_event
-    service_added = _handle_event
-    service_removed = _handle_event
-    service_status_update = _handle_event
+    # Message handlers by channel layer message type - all delegate to
+    # _handle_event. Looked up directly, without building a method name.
+    message_handlers = {
+        "status_update": _handle_event,
+        "service_added": _handle_event,
+        "service_removed": _handle_event,
+        "service_status_update": _handle_event,
+    }
 
     async def _send_event(self, event) -> None:
         """Send an event to the client."""
@@ -130,19 +367,41 @@ class ClientConsumer(AsyncHttpConsumer):
             return
 
         try:
-            validated_event = client_event_type_adapter.validate_python(event)
-            body = f"data: {validated_event.model_dump_json()}\n\n"
-            await self.send_body(body.encode("utf-8"), more_body=True)
+            if isinstance(event, BaseModel):
+                # Already a validated event model, serialized by its own
+                # serializer, skipping the union's type resolution
+                event_json = event.__pydantic_serializer__.to_json(event)
+            else:
+                validated_event = client_event_type_adapter.validate_python(event)
+                # dump_json encodes straight to UTF-8 bytes, no str round-trip
+                event_json = client_event_type_adapter.dump_json(validated_event)
         except ValidationError as e:
-            logger.error(f"SSE [{self.channel_name}] Validation error: {e}")
+            logger.error("SSE [%s] Validation error: %s", self.channel_name, e)
+            return
+        await self._send_frame(SSE_EVENT_FRAME % event_json)
+
+    async def _send_frame(self, frame: bytes) -> None:
+        """Send an already rendered SSE frame to the client."""
+        if self._disconnecting:
+            return
+
+        try:
+            await self._write(frame)
         except Exception as e:
-            logger.error(f"SSE [{self.channel_name}] Send error: {e}")
+            logger.error("SSE [%s] Send error: %s", self.channel_name, e)
+
+    async def _write(self, frames: bytes) -> None:
+        """Sends the frames, or buffers them while coalescing writes."""
+        if self._write_buffer is not None:
+            self._write_buffer.append(frames)
+            self._write_buffer_size += len(frames)
+            return
+        await self.send_body(frames, more_body=True)
+        self._last_write_at = asyncio.get_running_loop().time()
 
     async def _cleanup(self) -> None:
-        """Leave the group on disconnect."""
+        """Unsubscribe from the user's stream on disconnect."""
         try:
-            await self.channel_layer.group_discard(
-                self.user_clients_group_name, self.channel_name
-            )
+            await _close_user_stream(self.user_id, self._messages)
         except Exception:
             pass
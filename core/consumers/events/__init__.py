@@ -1,16 +1,20 @@
+from .broadcasting import broadcast_agent
 from .db import (
     get_agent,
     get_user_agents,
     update_agent_ip,
+    update_service_statuses,
 )
 from .handlers import handle_agent_event
 from .validation import agent_event_type_adapter, client_event_type_adapter
 
 __all__ = [
     "agent_event_type_adapter",
+    "broadcast_agent",
     "client_event_type_adapter",
     "get_agent",
     "get_user_agents",
     "handle_agent_event",
     "update_agent_ip",
+    "update_service_statuses",
 ]
@@ -1,81 +1,153 @@
 import logging
+from functools import cache
 
-from channels.layers import get_channel_layer
+from asgiref.sync import sync_to_async
+from channels.layers import BaseChannelLayer, get_channel_layer
+from channels_redis.core import RedisChannelLayer
 
 from core.consumers.groups import get_client_group_name
+from core.models import Agent
 
+from .mappers import map_agent_to_client_model
 from .typing import (
+    ClientEvent,
     ClientServiceAddedEvent,
     ClientServiceRemovedEvent,
     ClientServiceStatusUpdateEvent,
     ClientStatusUpdateEvent,
+    ClientStatusUpdatePayload,
 )
 
 logger = logging.getLogger(__name__)
 
+# Format of an SSE frame carrying one JSON encoded client event
+SSE_EVENT_FRAME = b"data: %s\n\n"
 
-async def broadcast_agent_status_update(
-    owner_id: int, event: ClientStatusUpdateEvent
+
+@cache
+def _get_channel_layer() -> BaseChannelLayer | None:
+    """Returns the default channel layer, looked up once per process."""
+    return get_channel_layer()
+
+
+def _redis_group_key(channel_layer: RedisChannelLayer, group: str) -> bytes:
+    """
+    Returns the Redis key of the group's member set.
+
+    channels-redis has no public API for it. This is the key format of
+    channels-redis 4 (see RedisChannelLayer._group_key), which pyproject
+    pins below 5.0, so a major upgrade has to revisit it.
+    """
+    return f"{channel_layer.prefix}:group:{group}".encode()
+
+
+async def has_client_subscribers(owner_id: int) -> bool:
+    """
+    Returns whether any client of the owner is subscribed to broadcasts.
+
+    Lets callers skip building events that are expensive to prepare when
+    nobody would receive them. It answers False only when the Redis group
+    key doesn't exist (Redis deletes a group's key once its last member
+    leaves). Any other channel layer is assumed to have subscribers.
+
+    A connection of the owner in this process answers True without asking
+    Redis.
+    """
+    # Imported here, the client consumer itself depends on this package
+    from core.consumers.client_consumer import has_local_subscribers
+
+    if has_local_subscribers(owner_id):
+        return True
+
+    channel_layer = _get_channel_layer()
+    if not isinstance(channel_layer, RedisChannelLayer):
+        return True
+
+    group = get_client_group_name(owner_id)
+    connection = channel_layer.connection(channel_layer.consistent_hash(group))
+    return bool(await connection.exists(_redis_group_key(channel_layer, group)))
+
+
+async def _broadcast(
+    owner_id: int,
+    message_type: str,
+    event: ClientEvent,
+    check_subscribers: bool = True,
 ) -> None:
     """
-    Helper to broadcast a pre-built agent status update event
-    to all connected clients for that agent's owner.
+    Sends a pre-built client event to all connected clients of the owner.
+
+    The event is rendered to its final SSE frame once here, and subscribers
+    write those bytes as-is, without validating or serializing it again.
+
+    Agents stay connected while their owner's clients mostly aren't, so
+    the send is skipped when no client is subscribed. The check is a single
+    EXISTS, where group_send on an empty group costs two Redis commands on
+    top of serializing the event. Callers that already checked pass
+    check_subscribers=False to skip it.
     """
-    channel_layer = get_channel_layer()
+    channel_layer = _get_channel_layer()
     if not channel_layer:
-        logger.debug("Channel layer not configured. Cannot broadcast agent status.")
+        logger.debug("Channel layer not configured. Cannot broadcast %s.", message_type)
+        return
+
+    if check_subscribers and not await has_client_subscribers(owner_id):
         return
 
-    user_clients_group_name = get_client_group_name(owner_id)
     await channel_layer.group_send(
-        user_clients_group_name,
+        get_client_group_name(owner_id),
         {
-            "type": "status_update",
-            "event": event.model_dump(mode="json"),
+            "type": message_type,
+            # The event model's own serializer writes UTF-8 JSON bytes,
+            # without resolving its type through the client event union
+            "sse_frame": SSE_EVENT_FRAME % event.__pydantic_serializer__.to_json(event),
         },
     )
 
 
-async def broadcast_service_added(
-    owner_id: int, event: ClientServiceAddedEvent
+async def broadcast_agent_status_update(
+    owner_id: int, event: ClientStatusUpdateEvent, check_subscribers: bool = True
 ) -> None:
     """
-    Broadcast service added event to clients.
+    Helper to broadcast a pre-built agent status update event
+    to all connected clients for that agent's owner.
     """
-    channel_layer = get_channel_layer()
-    if not channel_layer:
-        logger.debug("Channel layer not configured. Cannot broadcast service added.")
+    await _broadcast(owner_id, "status_update", event, check_subscribers)
+
+
+async def broadcast_agent(agent: Agent) -> None:
+    """
+    Broadcasts the agent's current state to all connected clients of its owner.
+    """
+    # Mapping the agent queries its services, skip it when nobody is listening
+    if not await has_client_subscribers(agent.owner_id):
         return
 
-    user_clients_group_name = get_client_group_name(owner_id)
-    await channel_layer.group_send(
-        user_clients_group_name,
-        {
-            "type": "service_added",
-            "event": event.model_dump(mode="json"),
-        },
+    agent_mapped_model = await sync_to_async(map_agent_to_client_model)(agent)
+    client_event = ClientStatusUpdateEvent(
+        data=ClientStatusUpdatePayload(agent=agent_mapped_model)
+    )
+    await broadcast_agent_status_update(
+        agent.owner_id, client_event, check_subscribers=False
     )
 
 
+async def broadcast_service_added(
+    owner_id: int, event: ClientServiceAddedEvent
+) -> None:
+    """
+    Broadcast service added event to clients.
+    """
+    await _broadcast(owner_id, "service_added", event)
+
+
 async def broadcast_service_removed(
     owner_id: int, event: ClientServiceRemovedEvent
 ) -> None:
     """
     Broadcast service removed event to clients.
     """
-    channel_layer = get_channel_layer()
-    if not channel_layer:
-        logger.debug("Channel layer not configured. Cannot broadcast service removed.")
-        return
-
-    user_clients_group_name = get_client_group_name(owner_id)
-    await channel_layer.group_send(
-        user_clients_group_name,
-        {
-            "type": "service_removed",
-            "event": event.model_dump(mode="json"),
-        },
-    )
+    await _broadcast(owner_id, "service_removed", event)
 
 
 async def broadcast_service_status_update(
@@ -84,18 +156,4 @@ async def broadcast_service_status_update(
     """
     Broadcast service status update event to clients.
     """
-    channel_layer = get_channel_layer()
-    if not channel_layer:
-        logger.debug(
-            "Channel layer not configured. Cannot broadcast service status update."
-        )
-        return
-
-    user_clients_group_name = get_client_group_name(owner_id)
-    await channel_layer.group_send(
-        user_clients_group_name,
-        {
-            "type": "service_status_update",
-            "event": event.model_dump(mode="json"),
-        },
-    )
+    await _broadcast(owner_id, "service_status_update", event)
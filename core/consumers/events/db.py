@@ -1,40 +1,79 @@
 import logging
 import uuid
+from functools import partial
 
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
 
 from core.models import Agent, Service
+from core.utils import AGENT_CACHE_TTL, get_agent_cache_key
 
-from .mappers import map_agent_to_client_model
+from .broadcasting import broadcast_service_added
+from .mappers import map_agent_to_client_model, map_service_to_client_model
 from .typing import (
     AgentServiceDataModel,
     AgentServiceStatusUpdatePayload,
+    ClientServiceAddedEvent,
+    ClientServiceAddedPayload,
 )
 
 logger = logging.getLogger(__name__)
 
+# Runs on the shared thread pool rather than the single thread-sensitive
+# thread, so independent reads from many connections can run in parallel.
+# Only for read-only helpers that don't depend on signals or transactions.
+parallel_database_sync_to_async = partial(
+    database_sync_to_async, thread_sensitive=False
+)
 
-@database_sync_to_async
+# Rows per statement for the bulk service writes
+SERVICE_BULK_BATCH_SIZE = 500
+
+
+@parallel_database_sync_to_async
 def get_agent(key: uuid.UUID) -> Agent | None:
     """
     Returns the agent with the given key if it exists and is registered, otherwise None.
+
+    The lookup is shared with AgentAuthentication through the agent cache, so
+    reconnect storms don't hit the database for every connection attempt.
     """
-    try:
-        return Agent.objects.select_related("owner").get(
-            key=key, registration_status=Agent.RegistrationStatus.REGISTERED
-        )
-    except Agent.DoesNotExist:
-        logger.warning(f"Connection attempt with invalid agent key: {key}")
+    cache_key = get_agent_cache_key(key)
+    agent = cache.get(cache_key)
+    if agent is None:
+        try:
+            agent = Agent.objects.select_related("owner").get(key=key)
+        except Agent.DoesNotExist:
+            logger.warning(f"Connection attempt with invalid agent key: {key}")
+            return None
+        cache.set(cache_key, agent, AGENT_CACHE_TTL)
+
+    if agent.registration_status != Agent.RegistrationStatus.REGISTERED:
+        logger.warning(f"Connection attempt with unregistered agent key: {key}")
         return None
+    return agent
 
 
-@database_sync_to_async
-def update_agent_ip(agent: Agent, new_ip: str | None) -> None:
+async def update_agent_ip(agent: Agent, new_ip: str | None) -> None:
+    """
+    Persists the agent's IP address if it changed.
+
+    The comparison runs on the event loop, so the common unchanged case
+    doesn't take a thread-pool hop.
+    """
     if new_ip and agent.ip_address != new_ip:
-        agent.ip_address = new_ip
-        agent.save(update_fields=["ip_address"])
-        logger.info(f"Updated IP for agent '{agent.name}' to {new_ip}")
+        await _save_agent_ip(agent, new_ip)
+
+
+@database_sync_to_async
+def _save_agent_ip(agent: Agent, new_ip: str) -> None:
+    agent.ip_address = new_ip
+    # A full save (not a queryset update) so post_save broadcasts the new IP
+    agent.save(update_fields=["ip_address"])
+    logger.info(f"Updated IP for agent '{agent.name}' to {new_ip}")
 
 
 @database_sync_to_async
@@ -43,78 +82,194 @@ def sync_agent_services_and_set_online(
 ) -> None:
     """
     Synchronize the agent's services with the given list of services and mark as online.
+
+    Existing services are fetched in one query and the changes are written
+    with bulk_create/bulk_update, so the query count doesn't grow with the
+    number of services. Bulk writes skip the per-service post_save broadcasts;
+    clients get the full service list from the agent status update that
+    mark_connected broadcasts instead.
     """
     incoming_service_ids = {
         service.id  # Those are the human readable IDs from the agent
         for service in services
     }
-    for service_data in services:
-        Service.objects.update_or_create(
-            agent=agent,
-            agent_service_id=service_data.id,
-            defaults={
-                "name": service_data.name,
-                "description": service_data.description,
-                "version": service_data.version,
-                "schedule": service_data.schedule,
-            },
+    # All of the agent's services are loaded once, so the stale ones are found
+    # with a set difference instead of a NOT IN delete. Not in_bulk():
+    # agent_service_id is only unique per agent, and in_bulk requires a field
+    # that is unique on its own.
+    existing_services = {
+        service.agent_service_id: service
+        for service in agent.services.only(
+            "id", "agent_service_id", "name", "description", "version", "schedule"
         )
-    agent.services.exclude(
-        agent_service_id__in=incoming_service_ids  # Filter deleted services
-    ).delete()
+    }
+    stale_service_ids = existing_services.keys() - incoming_service_ids
+    services_to_create = []
+    services_to_update = []
+    for service_data in services:
+        fields = {
+            "name": service_data.name,
+            "description": service_data.description,
+            "version": service_data.version,
+            "schedule": service_data.schedule,
+        }
+        service = existing_services.get(service_data.id)
+        if service is None:
+            services_to_create.append(
+                Service(agent=agent, agent_service_id=service_data.id, **fields)
+            )
+        elif any(getattr(service, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(service, name, value)
+            services_to_update.append(service)
+
+    with transaction.atomic():
+        if services_to_create:
+            Service.objects.bulk_create(
+                services_to_create,
+                batch_size=SERVICE_BULK_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        if services_to_update:
+            Service.objects.bulk_update(
+                services_to_update,
+                ["name", "description", "version", "schedule"],
+                batch_size=SERVICE_BULK_BATCH_SIZE,
+            )
+        if stale_service_ids:  # Services the agent no longer reports
+            agent.services.filter(agent_service_id__in=stale_service_ids).delete()
 
     agent.mark_connected()
 
 
+async def add_service(agent: Agent, service_data: AgentServiceDataModel) -> None:
+    """
+    Creates (or updates) a service from the given service data
+    and broadcasts it to the owner's clients.
+    """
+    service = await _upsert_service(agent, service_data)
+    event = ClientServiceAddedEvent(
+        data=ClientServiceAddedPayload(
+            agent_id=str(agent.pk), service=map_service_to_client_model(service)
+        )
+    )
+    await broadcast_service_added(agent.owner_id, event)
+
+
 @database_sync_to_async
-def add_service(agent: Agent, service_data: AgentServiceDataModel) -> None:
-    """Creates a service from the given service data"""
-    Service.objects.create(
-        agent=agent,
-        agent_service_id=service_data.id,
-        name=service_data.name,
-        description=service_data.description,
-        version=service_data.version,
-        schedule=service_data.schedule,
+def _upsert_service(agent: Agent, service_data: AgentServiceDataModel) -> Service:
+    """
+    Writes the service with a single INSERT ... ON CONFLICT DO UPDATE and
+    returns the stored row.
+
+    bulk_create doesn't send post_save, so add_service broadcasts the
+    'service_added' event itself.
+    """
+    Service.objects.bulk_create(
+        [
+            Service(
+                agent=agent,
+                agent_service_id=service_data.id,
+                name=service_data.name,
+                description=service_data.description,
+                version=service_data.version,
+                schedule=service_data.schedule,
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["agent", "agent_service_id"],
+        update_fields=["name", "description", "version", "schedule"],
     )
+    # Re-read, the in-memory instance lacks the status of an existing service
+    return Service.objects.get(agent=agent, agent_service_id=service_data.id)
 
 
 @database_sync_to_async
 def remove_service(agent: Agent, service_id: str) -> None:
+    """
+    Deletes the service. A model delete (not a queryset one) so the
+    post_delete receiver broadcasts the removal.
+    """
     try:
-        service = Service.objects.select_related("agent__owner").get(
+        service = Service.objects.only("id", "agent_id", "agent_service_id").get(
             agent=agent, agent_service_id=service_id
         )
+        service.agent = agent  # Reuse the loaded agent (and owner) in receivers
         service.delete()
     except Service.DoesNotExist:
-        logger.warning(f"Service {service_id} not found for agent {agent.pk}")
+        logger.warning("Service %s not found for agent %s", service_id, agent.pk)
 
 
 @database_sync_to_async
-def update_service_status(
+def update_service_statuses(
+    agent: Agent, updates: list[AgentServiceStatusUpdatePayload]
+) -> None:
+    """Stores a batch of service status updates in a single thread-pool hop."""
+    for update_data in updates:
+        _store_service_status(agent, update_data)
+
+
+def _store_service_status(
     agent: Agent, update_data: AgentServiceStatusUpdatePayload
 ) -> None:
+    """
+    Stores the service's latest status.
+
+    This is a save() rather than a single queryset update() because the
+    Service pre_save/post_save receivers broadcast the update and send the
+    status-change notifications. The lookup loads only the columns those
+    receivers read and primes the original status for pre_save, so the
+    whole update costs one SELECT and one UPDATE.
+    """
     try:
-        service = Service.objects.select_related("agent__owner").get(
-            agent=agent, agent_service_id=update_data.service_id
-        )
+        service = Service.objects.only(
+            "id", "agent_id", "agent_service_id", "name", "last_status"
+        ).get(agent=agent, agent_service_id=update_data.service_id)
+        service.agent = agent  # Reuse the loaded agent (and owner) in receivers
+        # Read by the pre_save_service_status receiver (core/receivers.py)
+        service._original_last_status = service.last_status
         service.last_status = update_data.status.value
         service.last_message = update_data.message
         service.last_seen = update_data.timestamp
         service.save(update_fields=["last_status", "last_message", "last_seen"])
     except Service.DoesNotExist:
         logger.warning(
-            f"Service {update_data.service_id} not found for agent {agent.pk}"
+            "Service %s not found for agent %s", update_data.service_id, agent.pk
         )
 
 
-@database_sync_to_async
+@parallel_database_sync_to_async
 def get_user_agents(user: User) -> list:
     """
     Returns all user's registered agents as ClientAgentDataModel list
+
+    Both queries load only the columns the client models are built from,
+    keeping the first event of a new SSE stream cheap.
     """
-    agents = Agent.objects.filter(
-        owner=user, registration_status=Agent.RegistrationStatus.REGISTERED
-    ).prefetch_related("services")
+    services = Service.objects.only(
+        "agent_id",
+        "agent_service_id",
+        "name",
+        "description",
+        "version",
+        "schedule",
+        "last_status",
+        "last_message",
+        "last_seen",
+    )
+    agents = (
+        Agent.objects.filter(
+            owner=user, registration_status=Agent.RegistrationStatus.REGISTERED
+        )
+        .only(
+            "id",
+            "name",
+            "registration_status",
+            "ip_address",
+            "is_online",
+            "last_seen",
+        )
+        .prefetch_related(Prefetch("services", queryset=services))
+    )
 
     return [map_agent_to_client_model(agent) for agent in agents]
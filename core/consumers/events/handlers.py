@@ -1,10 +1,19 @@
 import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
 
 from core.consumers.events.db import (
     add_service,
     remove_service,
     sync_agent_services_and_set_online,
-    update_service_status,
+)
+from core.consumers.events.typing import (
+    AgentReadyEvent,
+    AgentReadyPayload,
+    AgentServiceAddedEvent,
+    AgentServiceAddedPayload,
+    AgentServiceRemovedEvent,
+    AgentServiceRemovedPayload,
 )
 from core.consumers.events.validation import AgentEventType
 from core.models import Agent
@@ -12,25 +21,42 @@ from core.models import Agent
 logger = logging.getLogger(__name__)
 
 
+async def handle_agent_ready(agent: Agent, data: AgentReadyPayload) -> None:
+    logger.debug("Agent %s is ready.", agent.pk)
+    await sync_agent_services_and_set_online(agent, data.services)
+
+
+async def handle_service_added(agent: Agent, data: AgentServiceAddedPayload) -> None:
+    logger.debug("Agent %s added a new service. [%s]", agent.pk, data.service.id)
+    await add_service(agent, data.service)
+
+
+async def handle_service_removed(
+    agent: Agent, data: AgentServiceRemovedPayload
+) -> None:
+    logger.debug("Agent %s removed a service. [%s]", agent.pk, data.service_id)
+    await remove_service(agent, data.service_id)
+
+
+# Maps each agent event model to its handler. The validated event's class
+# is the key, so dispatch hashes and compares by identity, not string value.
+# Status updates are buffered and written by AgentConsumer instead.
+AGENT_EVENT_HANDLERS: dict[type, Callable[[Agent, Any], Awaitable[None]]] = {
+    AgentReadyEvent: handle_agent_ready,
+    AgentServiceAddedEvent: handle_service_added,
+    AgentServiceRemovedEvent: handle_service_removed,
+}
+
+
 async def handle_agent_event(agent: Agent, event: AgentEventType) -> None:
-    """Dispatches agent events"""
-    if event.type == "agent.ready":
-        logger.debug(f"Agent {agent.pk} is ready.")
-        await sync_agent_services_and_set_online(agent, event.data.services)
-
-    elif event.type == "agent.service_added":
-        logger.debug(f"Agent {agent.pk} added a new service. [{event.data.service.id}]")
-        await add_service(agent, event.data.service)
-
-    elif event.type == "agent.service_removed":
-        logger.debug(f"Agent {agent.pk} removed a service. [{event.data.service_id}]")
-        await remove_service(agent, event.data.service_id)
-
-    elif event.type == "agent.service_status_update":
-        logger.debug(
-            f"Agent {agent.pk} updated a service status. [{event.data.service_id}]"
-        )
-        await update_service_status(agent, event.data)
-
-    else:
-        logger.warning(f"Unknown event type: {event.type}")
+    """
+    Dispatches agent events.
+
+    The event is parsed and validated once in AgentConsumer.receive, so each
+    handler receives its already typed payload.
+    """
+    handler = AGENT_EVENT_HANDLERS.get(type(event))
+    if handler is None:
+        logger.warning("Unknown event type: %s", event.type)
+        return
+    await handler(agent, event.data)
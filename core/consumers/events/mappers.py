@@ -3,27 +3,36 @@ from core.consumers.events.typing import (
     ClientServiceDataModel,
     ServiceStatus,
 )
-from core.models import Agent
+from core.models import Agent, Service
+
+# The client models are built with model_construct, skipping validation:
+# the values come from typed ORM fields. Only the status is converted, so
+# it serializes as the enum it is declared as.
+
+# Statuses by their stored value, converted with a dict lookup instead of
+# an Enum call per service
+SERVICE_STATUSES = {status.value: status for status in ServiceStatus}
+
+
+def map_service_to_client_model(service: Service) -> ClientServiceDataModel:
+    """Maps a Service ORM object to ClientServiceDataModel."""
+    return ClientServiceDataModel.model_construct(
+        id=service.agent_service_id,
+        name=service.name,
+        description=service.description or "",
+        version=service.version or "",
+        schedule=service.schedule or "",
+        last_message=service.last_message or "",
+        last_seen=service.last_seen,
+        last_status=SERVICE_STATUSES.get(service.last_status, ServiceStatus.UNKNOWN),
+    )
 
 
 def map_agent_to_client_model(agent: Agent) -> ClientAgentDataModel:
     """Sync helper to map an Agent ORM object to ClientAgentDataModel."""
-    agent_services = []
-    for svc in agent.services.all():
-        agent_services.append(
-            ClientServiceDataModel(
-                id=svc.agent_service_id,
-                name=svc.name,
-                description=svc.description or "",
-                version=svc.version or "",
-                schedule=svc.schedule or "",
-                last_message=svc.last_message or "",
-                last_seen=svc.last_seen,
-                last_status=svc.last_status or ServiceStatus.UNKNOWN,
-            )
-        )
+    agent_services = [map_service_to_client_model(svc) for svc in agent.services.all()]
 
-    return ClientAgentDataModel(
+    return ClientAgentDataModel.model_construct(
         id=str(agent.pk),
         name=agent.name,
         registration_status=agent.registration_status,
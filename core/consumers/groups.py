@@ -7,9 +7,9 @@ def get_client_group_name(user_id: str | int) -> str:
         - ClientConsumer: Joins this group to receive updates.
         - Handlers: Sends messages to this group to notify the subscribed clients.
 
-    Note: Multiple SSE connections from the same user all join this group,
-    but they share a single channel name (see get_user_sse_channel_name).
-    This prevents race conditions in channels_redis.
+    Note: The SSE connections of a user within one process share a single
+    member of this group (see get_user_sse_channel_name), and the messages
+    are handed to each connection in-process.
     """
     return f"user_{user_id}_clients"
 
@@ -19,11 +19,12 @@ def get_user_sse_channel_name(user_id: str | int) -> str:
     Returns the base channel name for a user's SSE connections.
 
     This provides a deterministic prefix for all connections from a user.
-    Each connection should append a unique suffix (e.g., UUID) to create
-    the final channel name: f"{base_channel}_{unique_suffix}"
+    The stream shared by the user's connections in a process appends a
+    unique suffix (e.g., UUID) to create the final channel name:
+    f"{base_channel}_{unique_suffix}"
 
     This hybrid approach ensures:
-    - All clients receive messages (unique channels per connection)
+    - All processes receive messages (unique channels per process stream)
     - Debuggable channel names (user ID in prefix)
     - No race conditions in channels_redis
 
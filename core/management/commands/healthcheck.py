@@ -11,9 +11,14 @@ class Command(BaseCommand):
     def handle(self, *args: Any, **options: Any) -> None:
         db_conn = connections["default"]
         try:
-            db_conn.cursor()
+            # Each probe runs in a new process, so there is no connection to
+            # reuse: connect without opening a cursor, then close cleanly
+            # rather than leaving the backend to notice the dropped socket
+            db_conn.ensure_connection()
         except OperationalError as e:
             self.stdout.write(self.style.ERROR(f"Database unavailable: {e}"))
             exit(1)
         else:
             self.stdout.write(self.style.SUCCESS("Database available"))
+        finally:
+            db_conn.close()
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-16 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_add_agent_grace_period"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="agentregistration",
+            name="code",
+            field=models.CharField(blank=True, max_length=6),
+        ),
+        migrations.AddConstraint(
+            model_name="agentregistration",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "pending")),
+                fields=("code",),
+                name="unique_pending_registration_code",
+            ),
+        ),
+    ]
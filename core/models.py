@@ -1,12 +1,11 @@
 import secrets
-import string
 import uuid
 from datetime import timedelta
 from typing import Any
 
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -14,6 +13,9 @@ from .signals import agent_status_changed
 
 User = get_user_model()
 
+# Random codes tried for a new registration before giving up
+REGISTRATION_CODE_ATTEMPTS = 5
+
 
 class Agent(models.Model):
     class RegistrationStatus(models.TextChoices):
@@ -27,6 +29,9 @@ class Agent(models.Model):
             "A friendly name for the agent. Can be auto-generated on registration."
         ),
     )
+    # Stored as a native 16-byte uuid column on PostgreSQL. Its unique index
+    # already resolves the key lookups in AgentAuthentication and get_agent
+    # to at most one row, so no extra (key, registration_status) index is needed.
     key = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="agents")
@@ -133,25 +138,46 @@ class AgentRegistration(models.Model):
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    code = models.CharField(max_length=6, unique=True, blank=True)
+    code = models.CharField(max_length=6, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
     expires_at = models.DateTimeField(blank=True)
     failed_attempts = models.PositiveIntegerField(default=0)
     agent_credentials = models.JSONField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            # Codes are only looked up among pending registrations, so only
+            # those have to be unique
+            models.UniqueConstraint(
+                fields=["code"],
+                condition=models.Q(status="pending"),
+                name="unique_pending_registration_code",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"Registration {self.id} - {self.status}"
 
     def save(self, *args: Any, **kwargs: Any) -> None:
-        if self._state.adding:  # On creation
-            self.expires_at = timezone.now() + timedelta(minutes=1)
-            self.code = self.generate_unique_code()
-        super().save(*args, **kwargs)
-
-    def generate_unique_code(self) -> str:
-        while True:
-            code = "".join(secrets.choice(string.digits) for _ in range(6))
-            if not AgentRegistration.objects.filter(
-                code=code, status="pending"
-            ).exists():
-                return code
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        # On creation, the INSERT itself claims the code: a code already
+        # taken by a pending registration violates the unique constraint,
+        # and another one is tried
+        self.expires_at = timezone.now() + timedelta(minutes=1)
+        for attempt in range(REGISTRATION_CODE_ATTEMPTS):
+            self.code = self.generate_code()
+            try:
+                # A savepoint, so a taken code doesn't break an outer transaction
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                if attempt == REGISTRATION_CODE_ATTEMPTS - 1:
+                    raise
+
+    @staticmethod
+    def generate_code() -> str:
+        return f"{secrets.randbelow(1_000_000):06d}"
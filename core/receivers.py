@@ -1,34 +1,77 @@
+import asyncio
 from typing import Any
 
 from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import QuerySet
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 from core.consumers.events.broadcasting import (
-    broadcast_agent_status_update,
+    broadcast_agent,
     broadcast_service_added,
     broadcast_service_removed,
     broadcast_service_status_update,
 )
-from core.consumers.events.mappers import map_agent_to_client_model
+from core.consumers.events.db import parallel_database_sync_to_async
+from core.consumers.events.mappers import map_service_to_client_model
 from core.consumers.events.typing import (
     ClientServiceAddedEvent,
     ClientServiceAddedPayload,
-    ClientServiceDataModel,
     ClientServiceRemovedEvent,
     ClientServiceRemovedPayload,
     ClientServiceStatusUpdateEvent,
     ClientServiceStatusUpdatePayload,
-    ClientStatusUpdateEvent,
-    ClientStatusUpdatePayload,
     ServiceStatus,
 )
 from core.models import Agent, Service
+from core.utils import get_agent_cache_key
 from notifications.models import Device
 
 from .signals import agent_status_changed
 
 
+@parallel_database_sync_to_async
+def get_active_device_tokens(user_id: int) -> list[str]:
+    """
+    Returns the push tokens of the user's active devices.
+
+    A read outside of any transaction, so it runs on the shared thread pool
+    instead of queueing behind the writes on the thread-sensitive thread.
+    """
+    return list(
+        Device.objects.filter(user_id=user_id, status=Device.STATUS_ACTIVE).values_list(
+            "token", flat=True
+        )
+    )
+
+
+async def notify_user_devices(
+    user_id: int, title: str, body: str = "", channel_id: str | None = None
+) -> None:
+    """Sends one batched notification to all of the user's active devices."""
+    device_tokens = await get_active_device_tokens(user_id)
+    if device_tokens:
+        await Device.send_bulk_notification(
+            device_tokens, title=title, body=body, channel_id=channel_id
+        )
+
+
+async def get_service_owner_id(service: Service) -> int:
+    """
+    Returns the ID of the user owning the service's agent.
+
+    The consumers attach the agent they already loaded, so this usually
+    needs no query. Otherwise only the owner ID is selected, instead of
+    lazily loading the agent (which async receivers can't do).
+    """
+    if Service.agent.is_cached(service):
+        return service.agent.owner_id
+    return await sync_to_async(
+        Agent.objects.filter(pk=service.agent_id).values_list("owner_id", flat=True).get
+    )()
+
+
 @receiver(agent_status_changed)
 async def receive_agent_status_changed(sender, instance: Agent, is_online, **kwargs):
     """
@@ -42,19 +85,12 @@ async def receive_agent_status_changed(sender, instance: Agent, is_online, **kwa
     else:
         title = f'"{instance.name}" went offline'
 
-    # Fetch devices asynchronously
-    owner_devices = await sync_to_async(
-        lambda: list(
-            Device.objects.filter(user=instance.owner, status=Device.STATUS_ACTIVE)
-        )
-    )()
-
-    # Send notifications to all devices concurrently
-    for device in owner_devices:
-        await device.send_notification(
-            title=title,
-            channel_id="agent-status",
-        )
+    # Send one batched notification to all owner devices
+    await notify_user_devices(
+        user_id=instance.owner_id,
+        title=title,
+        channel_id="agent-status",
+    )
 
 
 @receiver(post_save, sender=Agent)
@@ -68,14 +104,17 @@ async def post_save_agent(
     """
     Handles Agent updates and broadcast the changes to all connected clients.
     """
-    # Prepare event payload
-    agent_mapped_model = await sync_to_async(map_agent_to_client_model)(instance)
-    client_event = ClientStatusUpdateEvent(
-        data=ClientStatusUpdatePayload(agent=agent_mapped_model)
-    )
+    await broadcast_agent(instance)
 
-    # Broadcast the event
-    await broadcast_agent_status_update(instance.owner_id, client_event)
+
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+def invalidate_agent_cache(sender: type[Agent], instance: Agent, **kwargs: Any) -> None:
+    """
+    Drops the cached agent lookup so the next request or connection
+    sees the saved (or deleted) agent.
+    """
+    cache.delete(get_agent_cache_key(instance.key))
 
 
 @receiver(pre_save, sender=Service)
@@ -85,8 +124,9 @@ async def pre_save_service_status(
     """
     Stores the original 'last_status' of a Service instance before it's saved.
     This allows the post_save signal to compare old and new values.
+    Callers that already know the original status may set it beforehand.
     """
-    if not instance._state.adding:
+    if not instance._state.adding and not hasattr(instance, "_original_last_status"):
         try:
             original_service = await sync_to_async(
                 lambda: Service.objects.only("last_status").get(pk=instance.pk)
@@ -114,26 +154,18 @@ async def post_save_service_status(
     """
 
     if created:
-        client_service = ClientServiceDataModel(
-            id=instance.agent_service_id,
-            name=instance.name,
-            description=instance.description or "",
-            version=instance.version or "",
-            schedule=instance.schedule or "",
-            last_message=instance.last_message or "",
-            last_seen=instance.last_seen,
-            last_status=instance.last_status or ServiceStatus.UNKNOWN,
-        )
         event = ClientServiceAddedEvent(
             data=ClientServiceAddedPayload(
-                agent_id=str(instance.agent.pk), service=client_service
+                agent_id=str(instance.agent_id),
+                service=map_service_to_client_model(instance),
             )
         )
-        await broadcast_service_added(instance.agent.owner_id, event)
+        await broadcast_service_added(await get_service_owner_id(instance), event)
         return
 
     # Logic for status updates on existing services
     if update_fields and "last_status" in update_fields:
+        owner_id = await get_service_owner_id(instance)
         # Broadcast the service status update event
         status_event = ClientServiceStatusUpdateEvent(
             data=ClientServiceStatusUpdatePayload(
@@ -144,37 +176,34 @@ async def post_save_service_status(
                 timestamp=instance.last_seen,
             )
         )
-        await broadcast_service_status_update(instance.agent.owner_id, status_event)
+        pending = [broadcast_service_status_update(owner_id, status_event)]
 
         # If status changed, send mobile notifications
         old_status = getattr(instance, "_original_last_status", None)
-        new_status = instance.last_status
-        if old_status != new_status:
-            status_lower = new_status.lower() if new_status else "unknown"
-            if status_lower not in [
-                "ok",
-                "warning",
-                "error",
-                "update",
-                "failure",
-                "unknown",
-            ]:
-                status_lower = "unknown"
-
-            channel_id = f"service-{status_lower}"
-            user_devices = await sync_to_async(
-                lambda: list(
-                    Device.objects.filter(
-                        user=instance.agent.owner, status=Device.STATUS_ACTIVE
-                    )
-                )
-            )()
-            for device in user_devices:
-                await device.send_notification(
-                    title=f"{instance.name} - {new_status}",
-                    body=instance.last_message,
-                    channel_id=channel_id,
-                )
+        if old_status != instance.last_status:
+            pending.append(notify_service_status_changed(instance, owner_id))
+
+        # The broadcast (Redis) and the notifications (push service) are
+        # independent, so their round-trips overlap
+        await asyncio.gather(*pending)
+
+
+# Android notification channel of each service status, built once rather
+# than on every notification
+SERVICE_STATUS_CHANNEL_IDS = {
+    status.value: f"service-{status.value.lower()}" for status in ServiceStatus
+}
+
+
+async def notify_service_status_changed(instance: Service, owner_id: int) -> None:
+    """Sends the service's new status to all of the owner's devices."""
+    new_status = instance.last_status
+    await notify_user_devices(
+        user_id=owner_id,
+        title=f"{instance.name} - {new_status}",
+        body=instance.last_message,
+        channel_id=SERVICE_STATUS_CHANNEL_IDS.get(new_status, "service-unknown"),
+    )
 
 
 @receiver(post_delete, sender=Service)
@@ -185,7 +214,11 @@ async def handle_service_deleted(
     Handles 'Service' deletion by broadcasting 'service_removed' event.
     """
     # Skip broadcasting if this service is being cascade-deleted with its agent
-    if await sync_to_async(Agent.objects.filter(id=instance.agent_id).exists)():
+    # (or owner). Told apart by the delete's origin, without a query: the
+    # agent row still exists while its services' post_delete is sent.
+    origin = kwargs.get("origin")
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not Service:
         return
 
     event = ClientServiceRemovedEvent(
@@ -193,4 +226,4 @@ async def handle_service_deleted(
             agent_id=str(instance.agent_id), service_id=instance.agent_service_id
         )
     )
-    await broadcast_service_removed(instance.agent.owner_id, event)
+    await broadcast_service_removed(await get_service_owner_id(instance), event)
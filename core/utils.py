@@ -1,5 +1,22 @@
+import hashlib
 from typing import Any, cast
 
+# Seconds an agent looked up by its key is served from the cache before
+# hitting the DB (see get_agent_cache_key).
+AGENT_CACHE_TTL = 30
+
+
+def get_agent_cache_key(agent_key: Any) -> str:
+    """
+    Returns the cache key of an agent looked up by its key.
+
+    Used by AgentAuthentication and the AgentConsumer lookup, and invalidated
+    by core.receivers whenever the agent is saved or deleted. The agent key
+    is a credential, so only a digest of it is used in the cache key.
+    """
+    digest = hashlib.sha256(str(agent_key).encode("utf-8")).hexdigest()[:16]
+    return f"agent:{digest}"
+
 
 def get_client_ip(scope: dict[str, Any]) -> str | None:
     """
@@ -15,12 +32,12 @@ def get_client_ip(scope: dict[str, Any]) -> str | None:
     Returns:
         The client's IP address as a string, or None if it cannot be determined.
     """
-    headers_list = scope.get("headers", [])
-    if headers_list:
-        headers = dict(cast(list[tuple[bytes, bytes]], headers_list))
-        x_forwarded_for = headers.get(b"x-forwarded-for")
-        if x_forwarded_for:
-            return x_forwarded_for.decode("utf-8").split(",")[0].strip()
+    headers_list = cast(list[tuple[bytes, bytes]], scope.get("headers", []))
+    x_forwarded_for = next(
+        (v for k, v in headers_list if k == b"x-forwarded-for"), None
+    )
+    if x_forwarded_for:
+        return x_forwarded_for.decode("utf-8").split(",")[0].strip()
 
     # Fallback to client info if available
     client_info = scope.get("client", (None, None))
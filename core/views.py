@@ -225,7 +225,9 @@ class AgentViewSet(viewsets.ModelViewSet):
             )
 
         agent.registration_status = Agent.RegistrationStatus.REGISTERED
-        agent.save()
+        # The agent may come from the authentication cache, so only persist
+        # the field we changed to avoid overwriting newer values.
+        agent.save(update_fields=["registration_status"])
 
         return Response(
             {
@@ -11,7 +11,6 @@ from core.consumers.groups import get_client_group_name
 logger = logging.getLogger(__name__)
 
 # Debug route mapping
-print("DEBUG: DebugDashboardConsumer loaded")
 logger.info("DebugDashboardConsumer initialized for agent listening")
 
 
@@ -179,11 +178,13 @@ class DebugDashboardConsumer(AsyncWebsocketConsumer):
 
     async def _forward_client_event(self, event: dict[str, Any]) -> None:
         """Helper to forward client group events to the dashboard."""
-        client_event_data = event.get("event")
-        if not client_event_data:
+        sse_frame = event.get("sse_frame")
+        if not sse_frame:
             return
 
         try:
+            client_event_data = json.loads(sse_frame.removeprefix(b"data: "))
+
             # Create debug-friendly event structure
             dashboard_event = {
                 "type": "client_event",
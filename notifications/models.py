@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import Any
 
@@ -9,6 +10,10 @@ User = get_user_model()
 
 logger = logging.getLogger("notifications")
 
+EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+# Expo accepts at most 100 messages per push request
+EXPO_PUSH_BATCH_SIZE = 100
+
 
 class Device(models.Model):
     OS_ANDROID = "Android"
@@ -80,7 +85,7 @@ class Device(models.Model):
         try:
             async with httpx.AsyncClient() as client:
                 response = await client.post(
-                    "https://exp.host/--/api/v2/push/send",
+                    EXPO_PUSH_URL,
                     headers={
                         "Accept": "application/json",
                         "Content-Type": "application/json",
@@ -94,3 +99,63 @@ class Device(models.Model):
         except httpx.RequestError as e:
             logger.error(f"Error sending notification to device {self.pk}: {e}")
             return None
+
+    @classmethod
+    async def send_bulk_notification(
+        cls,
+        tokens: list[str],
+        title: str = "Title",
+        body: str = "",
+        data: dict[str, Any] | None = None,
+        channel_id: str | None = None,
+        **extra: Any,
+    ) -> list[dict[str, Any]]:
+        """
+        Sends the same notification to all given device tokens,
+        batching the messages into as few push requests as possible.
+        The requests are sent concurrently over one client.
+        """
+        if data is None:
+            data = {}
+
+        messages = [
+            {
+                "to": token,
+                "title": title,
+                "body": body,
+                "data": data,
+                "channelId": channel_id,
+                **extra,
+            }
+            for token in tokens
+        ]
+
+        async def send_batch(
+            client: httpx.AsyncClient, batch: list[dict[str, Any]]
+        ) -> dict[str, Any] | None:
+            try:
+                response = await client.post(
+                    EXPO_PUSH_URL,
+                    headers={
+                        "Accept": "application/json",
+                        "Content-Type": "application/json",
+                        "Accept-Encoding": "gzip",
+                    },
+                    json=batch,
+                )
+                result: dict[str, Any] = response.json()
+                logger.info(f"Notification sent to {len(batch)} devices: {result}")
+                return result
+            # ValueError: the response was not JSON (e.g. an error page)
+            except (httpx.RequestError, ValueError) as e:
+                logger.error(f"Error sending notification to {len(batch)} devices: {e}")
+                return None
+
+        async with httpx.AsyncClient() as client:
+            results = await asyncio.gather(
+                *(
+                    send_batch(client, messages[start : start + EXPO_PUSH_BATCH_SIZE])
+                    for start in range(0, len(messages), EXPO_PUSH_BATCH_SIZE)
+                )
+            )
+        return [result for result in results if result is not None]
@@ -80,10 +80,13 @@ async def send_bulk_notifications(
     title: str,
     body: str,
     data: dict[str, Any] | None = None,
-) -> list[dict[str, Any] | None]:
+    channel_id: str | None = None,
+) -> list[dict[str, Any]]:
     """
     Send push notifications to multiple devices.
 
+    The messages are batched by Device.send_bulk_notification.
+
     Usage:
         send_bulk_notifications.enqueue(
             device_tokens=["token1", "token2"],
@@ -96,20 +99,21 @@ async def send_bulk_notifications(
         title: Notification title
         body: Notification body
         data: Optional data payload for all notifications
+        channel_id: Optional Android channel ID
 
     Returns:
-        List of responses from the Expo push service
+        List of responses from the Expo push service, one per sent batch
     """
-    results = []
-    for token in device_tokens:
-        result = await send_push_notification(
-            device_token=token,
-            title=title,
-            body=body,
-            data=data,
-        )
-        results.append(result)
-    return results
+    # Import here to avoid circular imports
+    from notifications.models import Device
+
+    return await Device.send_bulk_notification(
+        device_tokens,
+        title=title,
+        body=body,
+        data=data,
+        channel_id=channel_id,
+    )
 
 
 @task
@@ -12,7 +12,7 @@ import os
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-from django.urls import re_path
+from django.urls import get_resolver, re_path
 from servestatic import ServeStaticASGI
 
 from authentication.middleware import XSessionTokenMiddleware
@@ -23,6 +23,10 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
 
 django_asgi_app = get_asgi_application()
 
+# Import the URLconf and build the resolver's pattern caches at startup,
+# so the first request of each worker doesn't pay for it.
+get_resolver().reverse_dict
+
 if os.environ.get("ENVIRONMENT") == "production":
     django_asgi_app = ServeStaticASGI(django_asgi_app, root=STATIC_ROOT)
 
@@ -119,6 +119,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "authentication.middleware.PictureCacheMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
@@ -190,6 +191,16 @@ else:
         }
     }
 
+# Process-local cache (used for agent key lookups, see core.utils). Sized well
+# above the default of 300 entries, so reconnecting fleets don't evict each
+# other's cached agents.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+}
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTHENTICATION_BACKENDS = (
@@ -307,9 +318,18 @@ CHANNEL_LAYERS = {
             "capacity": 1500,
             "expiry": 60,
             "group_expiry": 3600,
+            # Pins channels-redis' default, msgpack, so a change of default
+            # can't switch it silently. Broadcast messages carry only
+            # primitives (the SSE frame is raw bytes), which msgpack packs
+            # compactly without a custom encoder.
+            "serializer_format": "msgpack",
         },
     },
 }
+
+# How long (ms) an SSE connection waits for more events before writing a
+# burst as a single chunk. 0 writes every event immediately.
+SSE_WRITE_DELAY_MS = int(os.getenv("SSE_WRITE_DELAY_MS", "0"))
 
 # dbbackup settings
 aws_s3_settings = {
@@ -358,9 +378,12 @@ CONSOLE_LEVEL = "DEBUG" if DEBUG else LOG_LEVEL
 
 # Logging configurations
 # There are 3 formatters (verbose, simple, json),
-# 2 handlers (console, file),
+# 3 output handlers (console, file, error_file),
+# 1 queue handler that feeds console and file from a background thread,
 # 2 package loggers (django, django.request),
 # and 4 app loggers (core, authentication, notifications, dbbackup_admin).
+# The queue listener is started in CoreConfig.ready so that log I/O never
+# blocks the ASGI event loop.
 # The LOG_LEVEL environment variable controls the log level for all loggers,
 # but can be overridden for each app using a LOG_LEVEL_[APP_NAME].
 LOGGING = {
@@ -406,10 +429,15 @@ LOGGING = {
             "backupCount": 3,
             "formatter": "verbose",
         },
+        "queue": {
+            "class": "logging.handlers.QueueHandler",
+            "handlers": ["console", "file"],
+            "respect_handler_level": True,
+        },
     },
     "loggers": {
         "django": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": os.getenv("LOG_LEVEL_DJANGO", "INFO"),
             "propagate": False,
         },
@@ -419,32 +447,32 @@ LOGGING = {
             "propagate": False,
         },
         "core": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": os.getenv("LOG_LEVEL_CORE", LOG_LEVEL).upper(),
             "propagate": False,
         },
         "authentication": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": os.getenv("LOG_LEVEL_AUTHENTICATION", LOG_LEVEL).upper(),
             "propagate": False,
         },
         "notifications": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": os.getenv("LOG_LEVEL_NOTIFICATIONS", LOG_LEVEL).upper(),
             "propagate": False,
         },
         "dbbackup_admin": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": os.getenv("LOG_LEVEL_DBBACKUP_ADMIN", LOG_LEVEL).upper(),
             "propagate": False,
         },
         "channels": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": os.getenv("LOG_LEVEL_CHANNELS", "INFO"),
             "propagate": False,
         },
         "channels_redis": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": os.getenv("LOG_LEVEL_CHANNELS_REDIS", "INFO"),
             "propagate": False,
         },